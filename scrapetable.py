@@ -14,17 +14,34 @@ compatibility. Do not edit the logic in `render_v0()`.
 """
 
 import asyncio
-import tempfile
+import codecs
+import itertools
+import os
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple, Optional, Protocol, Tuple, Union
-
-import cjwparquet
-import cjwparse.csv
-import pandas as pd
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Protocol,
+    Tuple,
+    Union,
+)
+
+import lxml.html
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from cjwmodule.http import HttpError, httpfile
 from cjwmodule.i18n import I18nMessage, trans
-
-EMPTY_DATAFRAME = pd.DataFrame()
+from cjwmodule.util.colnames import gen_unique_clean_colnames_and_warn
 
 
 class RenderError(NamedTuple):
@@ -53,11 +70,33 @@ class Settings(Protocol):
     MAX_BYTES_PER_VALUE: int
     MAX_BYTES_TEXT_DATA: int
     MAX_BYTES_PER_COLUMN_NAME: int
-    MAX_CSV_BYTES: int
     MAX_DICTIONARY_PYLIST_N_BYTES: int
     MIN_DICTIONARY_COMPRESSION_RATIO_PYLIST_N_BYTES: float
 
 
+_thread_local = threading.local()
+
+
+def _run_until_complete(coroutine):
+    """Run `coroutine` on an event loop this thread keeps for its lifetime.
+
+    asyncio.run() would build and tear down a new loop on every fetch. Each
+    thread gets its own loop, so fetches on different threads run in parallel.
+    Like asyncio.run(), cancel whatever tasks `coroutine` leaves behind.
+    """
+    loop = getattr(_thread_local, "loop", None)
+    if loop is None:
+        loop = _thread_local.loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+
 def fetch_arrow(
     params: Dict[str, Any],
     secrets: Dict[str, Any],
@@ -70,7 +109,7 @@ def fetch_arrow(
         return FetchResult(output_path)  # don't create a version
 
     try:
-        asyncio.run(httpfile.download(params["url"], output_path))
+        _run_until_complete(httpfile.download(params["url"], output_path))
     except HttpError as err:
         output_path.write_bytes(b"")
         return FetchResult(output_path, [RenderError(err.i18n_message)])
@@ -78,42 +117,220 @@ def fetch_arrow(
     return FetchResult(output_path)
 
 
-def _merge_colspan_headers(names: List[Union[int, str, Tuple[str]]]) -> List[str]:
+def _merge_colspan_headers(names: List[Union[str, Tuple[str, ...]]]) -> List[str]:
     """Turn tuple colnames into strings.
 
-    Pandas `read_html()` returns tuples for column names when scraping tables
-    with colspan. Collapse duplicate entries and reformats to be human
-    readable. E.g. ('year', 'year') -> 'year' and
-    ('year', 'month') -> 'year - month'
+    `_read_table()` returns tuples for column names when scraping tables with
+    several header rows -- usually because of colspan. Collapse duplicate
+    entries and reformats to be human readable. E.g. ('year', 'year') ->
+    'year' and ('year', 'month') -> 'year - month'
 
     Returned column names may be duplicates. They may be empty or too long.
     """
     ret = []
     for name in names:
-        if isinstance(name, tuple):
-            # Convert to dict, then call .keys() -- to remove duplicates.
-            # (Python dicts return keys in insertion order)
-            name = " - ".join(dict((s, None) for s in name).keys())
-        elif isinstance(name, int):
-            # If first row isn't header and there's no <thead>, table.columns
-            # will be an integer index.
-            name = ""  # auto-generate column name
-        else:
-            # it's already a str
-            pass
+        # Most tables have one header row, so most names are str: one cheap
+        # type check lets those through as-is
+        if type(name) is tuple:
+            # Remove duplicates, preserving order
+            seen = set()
+            parts = []
+            for s in name:
+                if s not in seen:
+                    seen.add(s)
+                    parts.append(s)
+            name = " - ".join(parts)
         ret.append(name)
     return ret
 
 
-def _write_dataframe_as_arrow_table_and_handle_lots_of_edge_cases(
+def _format_datetimes(data: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Format timestamps or dates the way `DataFrame.to_csv()` did.
+
+    If every value is midnight, write "YYYY-MM-DD". Otherwise, write
+    "YYYY-MM-DD HH:MM:SS" plus as many decimals as the column needs.
+    """
+    values = data.to_numpy().astype("datetime64[ns]")
+    is_null = np.isnat(values)
+    nanos = values[~is_null].view(np.int64)
+    for unit, unit_nanos in (
+        ("D", 86400 * 10**9),
+        ("s", 10**9),
+        ("ms", 10**6),
+        ("us", 10**3),
+    ):
+        if not (nanos % unit_nanos).any():
+            break
+    else:
+        unit = "ns"
+    texts = np.char.replace(np.datetime_as_string(values, unit=unit), "T", " ")
+    return pa.chunked_array([pa.array(texts, pa.utf8(), mask=is_null)])
+
+
+def _format_tz_datetimes(data: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Format timezone-aware timestamps the way `DataFrame.to_csv()` did.
+
+    Each value gets as many decimals as it needs, plus an offset:
+    "YYYY-MM-DD HH:MM:SS[.ffffff[fff]]+00:00". pandas wrote wall time in the
+    column's timezone; that needs a timezone database, so we write UTC. The
+    offset says so, and the instant is the same.
+    """
+    values = data.to_numpy().astype("datetime64[ns]")  # UTC
+    is_null = np.isnat(values)
+    nanos = values.view(np.int64) % 10**9
+    texts = np.select(
+        [nanos == 0, nanos % 1000 == 0],
+        [
+            np.datetime_as_string(values, unit="s"),
+            np.datetime_as_string(values, unit="us"),
+        ],
+        np.datetime_as_string(values, unit="ns"),
+    )
+    texts = np.char.add(np.char.replace(texts, "T", " "), "+00:00")
+    return pa.chunked_array([pa.array(texts, pa.utf8(), mask=is_null)])
+
+
+def _format_bools(data: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Format bools the way `DataFrame.to_csv()` did: "True" and "False"."""
+    values = pc.fill_null(data, pa.scalar(False)).to_numpy()
+    texts = np.where(values, "True", "False")
+    is_null = pc.is_null(data).to_numpy()
+    return pa.chunked_array([pa.array(texts, pa.utf8(), mask=is_null)])
+
+
+def _utf8_array(data: pa.ChunkedArray) -> pa.Array:
+    """Convert `data` to a single utf8 Array, with "" instead of null.
+
+    This is what `DataFrame.to_csv()` used to write for each value.
+    """
+    if pa.types.is_timestamp(data.type) and data.type.tz is not None:
+        data = _format_tz_datetimes(data)
+    elif pa.types.is_timestamp(data.type) or pa.types.is_date(data.type):
+        data = _format_datetimes(data)  # pyarrow can't cast these to utf8
+    elif pa.types.is_boolean(data.type):
+        data = _format_bools(data)  # pyarrow would write "true"/"false"
+    else:
+        try:
+            data = data.cast(pa.utf8())
+        except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+            # time64, decimal128, list, binary that isn't UTF-8, ...: to_csv()
+            # wrote str() of each value, and so do we
+            texts = [None if v is None else str(v) for v in data.to_pylist()]
+            data = pa.chunked_array([pa.array(texts, pa.utf8())])
+    data = pc.fill_null(data, pa.scalar("", pa.utf8()))
+    if data.num_chunks == 1:
+        return data.chunk(0)
+    elif data.num_chunks == 0:
+        return pa.array([], pa.utf8())
+    else:
+        return pa.concat_arrays(data.chunks)
+
+
+def _truncate_utf8_array(data: pa.Array, max_n_bytes: int) -> Tuple[pa.Array, int, int]:
+    """Truncate each value in `data` to `max_n_bytes` of UTF-8.
+
+    Return (truncated_data, n_values_truncated, first_truncated_row_index).
+    Usually no value is too long, so `data` is returned as-is with (0, -1).
+    """
+    n_bytes = pc.binary_length(data).to_numpy()
+    too_long = np.flatnonzero(n_bytes > max_n_bytes)
+    if not len(too_long):
+        return data, 0, -1
+
+    values = data.to_pylist()
+    for i in too_long:
+        # errors="ignore" nixes the multi-byte character we sliced in half
+        values[i] = (
+            values[i].encode("utf-8")[:max_n_bytes].decode("utf-8", errors="ignore")
+        )
+    return pa.array(values, pa.utf8()), len(too_long), int(too_long[0])
+
+
+def _autocast_array(data: pa.Array) -> pa.Array:
+    """Convert `data` to float64 or int(32|16|8); as fallback, return `data`.
+
+    Assume `data` is utf8 with no nulls. "" becomes null. Columns of all-""
+    stay text. So do columns that contain "NaN" or "Inf": Workbench doesn't
+    support those.
+    """
+    is_number = pc.greater(pc.binary_length(data), pa.scalar(0, pa.int32()))
+    texts = data.filter(is_number)
+    if not len(texts):
+        return data
+
+    try:
+        numbers = texts.cast(pa.float64()).to_numpy()
+    except pa.ArrowInvalid:
+        # Some string somewhere wasn't a number
+        return data
+
+    if not np.isfinite(numbers).all():
+        return data
+
+    # Put the numbers back where they came from; NaN becomes null
+    values = np.full(len(data), np.nan)
+    values[is_number.to_numpy(zero_copy_only=False)] = numbers
+    result = pa.array(values, from_pandas=True)
+
+    # Downcast integers, when possible. pyarrow raises "Float value truncated"
+    # if a conversion would be lossy; keep the last successful `result`.
+    try:
+        result = result.cast(pa.int32())
+        result = result.cast(pa.int16())
+        result = result.cast(pa.int8())
+    except pa.ArrowInvalid:
+        pass
+
+    return result
+
+
+def _utf8_array_pylist_n_bytes(data: pa.Array) -> int:
+    """Estimate how much RAM `data.to_pylist()` would take.
+
+    8 bytes per pointer, 50 bytes of overhead per str (heuristic), plus text.
+    """
+    n_text_bytes = pc.sum(pc.binary_length(data)).as_py() or 0
+    return 8 * len(data) + 50 * (len(data) - data.null_count) + n_text_bytes
+
+
+def _maybe_dictionary_encode_array(data: pa.Array, settings: Settings) -> pa.Array:
+    """Dictionary-encode utf8 `data`, if that saves enough RAM.
+
+    Same heuristic cjwparse uses. Non-text and all-null arrays are returned
+    as-is.
+    """
+    if data.type != pa.utf8() or data.null_count == len(data):
+        return data
+
+    encoded = data.dictionary_encode()
+    new_cost = _utf8_array_pylist_n_bytes(encoded.dictionary)
+    if new_cost > settings.MAX_DICTIONARY_PYLIST_N_BYTES:
+        return data  # dictionary is too large
+
+    old_cost = _utf8_array_pylist_n_bytes(data)
+    if old_cost / new_cost >= settings.MIN_DICTIONARY_COMPRESSION_RATIO_PYLIST_N_BYTES:
+        return encoded
+    else:
+        return data
+
+
+def _write_arrow_table_and_handle_lots_of_edge_cases(
     *,
-    table: pd.DataFrame,
+    table: pa.Table,
     output_path: Path,
     first_row_is_header: bool,
     colnames: List[str],
-    settings: Settings
+    settings: Settings,
+    n_skipped_rows: int = 0,
+    n_skipped_columns: int = 0,
 ) -> List[I18nMessage]:
-    """Convert ugly Pandas DataFrame to sane Arrow file and warnings.
+    """Convert ugly Arrow table to sane Arrow file and warnings.
+
+    `table` may have columns of any type: each value is converted to text
+    before anything else happens.
+
+    `n_skipped_rows` and `n_skipped_columns` count data the caller dropped
+    before building `table`, to save work. Warnings include them.
 
     Features:
 
@@ -126,32 +343,119 @@ def _write_dataframe_as_arrow_table_and_handle_lots_of_edge_cases(
       (and uses the first row of data as header) if first_row_is_header=True.
     * Auto-converts text to numbers.
     * If first_row_is_header=True but there are no data rows, assume False.
+    * Dictionary-encodes text columns, when that saves RAM.
     """
-    # cjwparse does all this already. So let's convert to CSV and back to Arrow.
-
-    # Specify the CSV header row, if we want it
-    #
-    # parse_csv() will not "trust" this header row: it will clean column
-    # names, truncate too-long columns, etc. And if we pass
-    # header=False, parse_csv() will do all that logic with the _second_
-    # row, because it will treat the second row as header.
-    if first_row_is_header and len(table):
-        header = False
-    else:
-        header = colnames
+    warnings = []
 
-    with tempfile.NamedTemporaryFile() as tf:
-        table.to_csv(tf.name, encoding="utf-8", index=False, header=header)
-        tf.flush()
-        return cjwparse.csv.parse_csv(
-            Path(tf.name),
-            output_path=output_path,
-            encoding="utf-8",
-            settings=settings,
-            delimiter=",",
-            has_header=True,
-            autoconvert_text_to_numbers=True,
+    columns = table.columns
+    colnames = list(colnames)
+    n_columns = len(columns) + n_skipped_columns
+    if n_columns > settings.MAX_COLUMNS_PER_TABLE:
+        warnings.append(
+            trans(
+                "warning.skippedColumns",
+                "{n_columns, plural, one{Skipped # column} other{Skipped # columns}} (after column limit of {max_n_columns})",
+                dict(
+                    n_columns=n_columns - settings.MAX_COLUMNS_PER_TABLE,
+                    max_n_columns=settings.MAX_COLUMNS_PER_TABLE,
+                ),
+            )
+        )
+        columns = columns[: settings.MAX_COLUMNS_PER_TABLE]
+        colnames = colnames[: settings.MAX_COLUMNS_PER_TABLE]
+
+    n_header_rows = 1 if first_row_is_header and table.num_rows else 0
+    n_rows = table.num_rows - n_header_rows + n_skipped_rows
+
+    if n_rows > settings.MAX_ROWS_PER_TABLE:
+        warnings.append(
+            trans(
+                "warning.skippedRows",
+                "{n_rows, plural, one{Skipped # row} other{Skipped # rows}} (after row limit of {max_n_rows})",
+                dict(
+                    n_rows=n_rows - settings.MAX_ROWS_PER_TABLE,
+                    max_n_rows=settings.MAX_ROWS_PER_TABLE,
+                ),
+            )
         )
+        n_rows = min(settings.MAX_ROWS_PER_TABLE, table.num_rows - n_header_rows)
+        # Zero-copy: slice before converting, so we never convert skipped rows
+        columns = [column.slice(0, n_header_rows + n_rows) for column in columns]
+
+    arrays = [_utf8_array(column) for column in columns]
+
+    if n_header_rows:
+        colnames = [array[0].as_py() for array in arrays]
+        arrays = [array[1:] for array in arrays]
+
+    n_values_truncated = 0
+    first_truncated = None  # (row_index, column_index)
+    for column_index, array in enumerate(arrays):
+        array, n_truncated, row_index = _truncate_utf8_array(
+            array, settings.MAX_BYTES_PER_VALUE
+        )
+        if n_truncated:
+            arrays[column_index] = array
+            n_values_truncated += n_truncated
+            if first_truncated is None or row_index < first_truncated[0]:
+                first_truncated = (row_index, column_index)
+    if n_values_truncated:
+        warnings.append(
+            trans(
+                "warning.truncatedValues",
+                "{n_values, plural, one{Truncated # value} other{Truncated # values}} (value byte limit is {max_n_bytes}; see row {row_number} column {column_number})",
+                dict(
+                    n_values=n_values_truncated,
+                    max_n_bytes=settings.MAX_BYTES_PER_VALUE,
+                    row_number=first_truncated[0] + 1,
+                    column_number=first_truncated[1] + 1,
+                ),
+            )
+        )
+
+    # Keep as many whole rows as fit in settings.MAX_BYTES_TEXT_DATA
+    row_n_bytes = np.zeros(n_rows, np.int64)
+    for array in arrays:
+        row_n_bytes += pc.binary_length(array).to_numpy()
+    n_rows_that_fit = int(
+        np.searchsorted(
+            np.cumsum(row_n_bytes), settings.MAX_BYTES_TEXT_DATA, side="right"
+        )
+    )
+    if n_rows_that_fit < n_rows:
+        warnings.append(
+            trans(
+                "warning.tooMuchText",
+                "{n_rows, plural, one{Skipped # row} other{Skipped # rows}} (after text limit of {max_n_bytes} bytes)",
+                dict(
+                    n_rows=n_rows - n_rows_that_fit,
+                    max_n_bytes=settings.MAX_BYTES_TEXT_DATA,
+                ),
+            )
+        )
+        arrays = [array[:n_rows_that_fit] for array in arrays]
+
+    names, colname_warnings = gen_unique_clean_colnames_and_warn(
+        [name or "" for name in colnames], settings=settings
+    )
+    warnings.extend(colname_warnings)
+
+    def finish_array(array: pa.Array) -> pa.Array:
+        return _maybe_dictionary_encode_array(_autocast_array(array), settings)
+
+    # Columns are independent, and pyarrow releases the GIL while casting
+    if len(arrays) > 1:
+        with ThreadPoolExecutor(min(len(arrays), os.cpu_count() or 1)) as executor:
+            arrays = list(executor.map(finish_array, arrays))
+    else:
+        arrays = [finish_array(array) for array in arrays]
+    table = pa.Table.from_arrays(arrays, names=names)
+
+    with pa.OSFile(output_path.as_posix(), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    return warnings
 
 
 def _render_v0(
@@ -159,22 +463,384 @@ def _render_v0(
     fetch_result: FetchResult,
     output_path: Path,
     params: Dict[str, Any],
-    settings: Settings
+    settings: Settings,
 ) -> List[I18nMessage]:
+    import cjwparquet
+
     with cjwparquet.open_as_mmapped_arrow(fetch_result.path) as arrow_table:
-        table = arrow_table.to_pandas(ignore_metadata=True)
-
-    render_errors = _write_dataframe_as_arrow_table_and_handle_lots_of_edge_cases(
-        table=table,
-        output_path=output_path,
-        first_row_is_header=params["first_row_is_header"],
-        colnames=table.columns,
-        settings=settings,
-    )
+        # Write while the table is still mmapped. Don't convert to Pandas:
+        # that would copy all the data.
+        render_errors = _write_arrow_table_and_handle_lots_of_edge_cases(
+            table=arrow_table,
+            output_path=output_path,
+            first_row_is_header=params["first_row_is_header"],
+            colnames=arrow_table.column_names,
+            settings=settings,
+        )
 
     return fetch_result.errors + render_errors
 
 
+_CHARSET_RE = re.compile(r"""charset=(?:"([^"]+)"|'([^']+)'|([^;\s"'>]+))""", re.I)
+
+
+def _find_charset(text: str) -> Optional[str]:
+    """Find "charset=..." in a Content-Type header or HTML <meta> tag."""
+    match = _CHARSET_RE.search(text)
+    if match is None:
+        return None
+    return match.group(1) or match.group(2) or match.group(3)
+
+
+def _find_tables(body_path: Path, encoding: str) -> List[lxml.html.HtmlElement]:
+    """Find <table> elements with text and rows in them, in document order.
+
+    We used to call `pandas.read_html()`, and "tablenum" should mean what it
+    has always meant. pandas counted a table if any text in it has a
+    non-newline character -- even a space -- and then skipped it if it gave
+    no rows. A table with just a <caption> gives no rows.
+    """
+    # libxml2 and Python name charsets differently. "latin_1" is Python's
+    # name; codecs.lookup() normalizes it to "iso8859-1", which libxml2 knows.
+    try:
+        names = [encoding, codecs.lookup(encoding).name]
+    except LookupError:
+        names = [encoding]
+    for name in names + [None]:  # None means, "let lxml guess"
+        try:
+            # huge_tree: libxml2's defaults give up on deeply-nested markup and
+            # on text over 10MB -- silently. Our limits bound the output.
+            parser = lxml.html.HTMLParser(encoding=name, huge_tree=True)
+            break
+        except LookupError:
+            pass
+    root = lxml.html.parse(body_path.as_posix(), parser=parser).getroot()
+    if root is None:
+        return []  # empty document
+    return [
+        table
+        for table in root.iter("table")
+        if any(text.strip("\n") for text in table.itertext()) and _has_rows(table)
+    ]
+
+
+_WHITESPACE_RE = re.compile(r"[\r\n]+|\s{2,}")
+
+# Browsers clamp these, too. This stops a tiny page from eating all our RAM.
+_MAX_COLSPAN = 1000
+_MAX_ROWSPAN = 65534
+
+
+def _cells(row: lxml.html.HtmlElement) -> List[lxml.html.HtmlElement]:
+    # Direct children only: `row` may be a <thead> (see _find_trs()). This is
+    # "./td|./th", without the cost of compiling XPath for every row.
+    return [child for child in row if child.tag in ("td", "th")]
+
+
+def _span(cell: lxml.html.HtmlElement, attr: str, max_value: int) -> int:
+    value = cell.get(attr)
+    if value is None:
+        return 1  # the usual case: skip int() parsing
+    try:
+        return min(max(int(value), 1), max_value)
+    except ValueError:
+        return 1
+
+
+def _expand_colspan_rowspan(
+    rows: Iterable[lxml.html.HtmlElement],
+) -> Iterator[List[lxml.html.HtmlElement]]:
+    """Turn <tr> elements into lists of cells, lazily.
+
+    A cell with colspan=N appears N times in its row. A cell with rowspan=N
+    appears in the N-1 rows below it, too. Rows may have different lengths.
+
+    Each <tr> is read only when the caller asks for its row. Reading text is
+    the caller's job: that's the expensive part, and the caller may not need
+    it.
+    """
+    remainder = []  # list of (index, cell, nrows), from rowspan above
+
+    for tr in rows:
+        cells = []
+        next_remainder = []
+
+        index = 0
+        for td in _cells(tr):
+            # Append cells from previous rows with rowspan>1 that come before
+            # this <td>
+            while remainder and remainder[0][0] <= index:
+                prev_i, prev_cell, prev_rowspan = remainder.pop(0)
+                cells.append(prev_cell)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_i, prev_cell, prev_rowspan - 1))
+                index += 1
+
+            # Append this <td>, colspan times
+            rowspan = _span(td, "rowspan", _MAX_ROWSPAN)
+            colspan = _span(td, "colspan", _MAX_COLSPAN)
+            for _ in range(colspan):
+                cells.append(td)
+                if rowspan > 1:
+                    next_remainder.append((index, td, rowspan - 1))
+                index += 1
+
+        # Append cells from previous rows at the final position
+        for prev_i, prev_cell, prev_rowspan in remainder:
+            cells.append(prev_cell)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_cell, prev_rowspan - 1))
+
+        yield cells
+        remainder = next_remainder
+
+    # Append rows that only appear because the last row had rowspan>1
+    while remainder:
+        next_remainder = []
+        cells = []
+        for prev_i, prev_cell, prev_rowspan in remainder:
+            cells.append(prev_cell)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_cell, prev_rowspan - 1))
+        yield cells
+        remainder = next_remainder
+
+
+def _cell_text(cell: lxml.html.HtmlElement) -> str:
+    return _WHITESPACE_RE.sub(" ", cell.text_content()).strip()
+
+
+def _row_texts(row: List[lxml.html.HtmlElement]) -> List[str]:
+    texts = {}  # colspan repeats a cell: read its text once
+    return [
+        texts[cell] if cell in texts else texts.setdefault(cell, _cell_text(cell))
+        for cell in row
+    ]
+
+
+def _is_blank_row(row: List[lxml.html.HtmlElement]) -> bool:
+    # pandas drops these -- but only after padding rows to the table's width.
+    # So callers only drop them from one-column tables.
+    return len(row) <= 1 and not (row and _cell_text(row[0]))
+
+
+def _find_trs(
+    table: lxml.html.HtmlElement,
+) -> Tuple[
+    List[lxml.html.HtmlElement],
+    List[lxml.html.HtmlElement],
+    List[lxml.html.HtmlElement],
+]:
+    """Return (header_trs, body_trs, footer_trs) of `table`, in document order.
+
+    html5lib, which we used before, repaired markup that lxml leaves as-is.
+    So find every <tr> whose nearest <table> is `table` -- even if it's
+    wrapped in, say, a <form> -- but none of a nested table's <tr>s. And
+    where <td>s or <th>s aren't in a <tr> (e.g., <thead><th>foo</th></thead>),
+    pretend their parent is a <tr>.
+
+    Header rows come from <thead>. If there is no <thead>, the top all-<th>
+    rows are header rows.
+    """
+    header_trs = []
+    body_trs = []
+    footer_trs = []
+
+    # Depth-first, without recursion: huge_tree allows very deep markup
+    stack = [(iter(table), table, body_trs)]
+    parents_with_cells = set()
+    while stack:
+        children, parent, trs = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+        elif child.tag == "tr":
+            trs.append(child)
+        elif child.tag in ("td", "th"):
+            if parent not in parents_with_cells:
+                parents_with_cells.add(parent)
+                trs.append(parent)
+        elif child.tag == "thead":
+            stack.append((iter(child), child, header_trs))
+        elif child.tag == "tfoot":
+            stack.append((iter(child), child, footer_trs))
+        elif child.tag != "table" and isinstance(child.tag, str):  # not comment
+            stack.append((iter(child), child, trs))
+
+    if not header_trs:
+        while body_trs and all(cell.tag == "th" for cell in _cells(body_trs[0])):
+            header_trs.append(body_trs.pop(0))
+
+    return header_trs, body_trs, footer_trs
+
+
+def _has_rows(table: lxml.html.HtmlElement) -> bool:
+    """Return True if `table` has a row `_read_table_rows()` wouldn't skip.
+
+    Usually the first row answers this, so we needn't expand the rest.
+    """
+    return any(
+        not _is_blank_row(row)
+        for trs in _find_trs(table)
+        for row in _expand_colspan_rowspan(trs)
+    )
+
+
+def _read_table_rows(
+    table: lxml.html.HtmlElement, max_n_body_rows: int
+) -> Tuple[List[List[str]], List[List[str]], int, int]:
+    """Return (header_rows, body_rows, n_columns, n_skipped_rows) of a <table>.
+
+    See `_find_trs()` for which rows are header rows. <tfoot> rows go at the
+    end of the body. If the table is one column wide, blank rows are skipped; otherwise they're kept, and
+    `_read_table()` pads them.
+
+    Stop reading body rows after `max_n_body_rows`: expanding cells and
+    reading their text is most of the cost of reading a huge table.
+    `n_skipped_rows` counts the remaining rows by the same rules, without
+    reading their text. `n_columns` is the width of the widest row read or
+    counted: skipped rows may widen the table, but only while it seems to be
+    one column wide.
+    """
+    header_trs, body_trs, footer_trs = _find_trs(table)
+    header_rows = list(_expand_colspan_rowspan(header_trs))
+    width = max((len(row) for row in header_rows), default=0)
+
+    # _expand_colspan_rowspan() pulls from these iterators one <tr> at a time,
+    # so after we stop reading, they hold exactly the <tr>s we never expanded.
+    body_tr_iter = iter(body_trs)
+    footer_tr_iter = iter(footer_trs)
+    rows = itertools.chain(
+        _expand_colspan_rowspan(body_tr_iter), _expand_colspan_rowspan(footer_tr_iter)
+    )
+    body_rows = []
+    n_kept_rows = 0  # rows we'll keep, if the table stays this wide
+    if max_n_body_rows > 0:
+        for row in rows:
+            body_rows.append(row)
+            width = max(width, len(row))
+            if width > 1:
+                n_kept_rows = len(body_rows)
+            elif not _is_blank_row(row):
+                n_kept_rows += 1
+            if n_kept_rows >= max_n_body_rows:
+                break
+
+    # Count the rows we didn't read -- including rows a trailing rowspan adds.
+    # Their width matters, too: it decides whether blank rows are skipped.
+    n_rest_rows = 0
+    n_rest_blank_rows = 0
+    if width > 1 and not table.xpath("descendant::*[@rowspan]"):
+        # Shortcut: each <tr> is one row, and we'll keep blank rows
+        n_rest_rows = sum(1 for _ in itertools.chain(body_tr_iter, footer_tr_iter))
+    else:
+        for row in rows:
+            width = max(width, len(row))
+            n_rest_rows += 1
+            if _is_blank_row(row):
+                n_rest_blank_rows += 1
+
+    if width <= 1:
+        # Like pandas, skip blank lines -- header or body
+        header_rows = [row for row in header_rows if not _is_blank_row(row)]
+        body_rows = [row for row in body_rows if not _is_blank_row(row)]
+        n_rest_rows -= n_rest_blank_rows
+        if not header_rows and not body_rows and not n_rest_rows:
+            width = 0  # every row was blank
+
+    n_skipped_rows = max(0, len(body_rows) - max_n_body_rows) + n_rest_rows
+
+    return (
+        [_row_texts(row) for row in header_rows],
+        [_row_texts(row) for row in body_rows[:max_n_body_rows]],
+        width,
+        n_skipped_rows,
+    )
+
+
+def _dedupe_names(
+    names: List[Union[str, Tuple[str, ...]]]
+) -> List[Union[str, Tuple[str, ...]]]:
+    """Rename ["A", "A"] to ["A", "A.1"] -- or ("x", "A") to ("x", "A.1")."""
+    ret = []
+    counts = defaultdict(int)
+    for name in names:
+        count = counts[name]
+        while count > 0:
+            counts[name] = count + 1
+            if isinstance(name, tuple):
+                name = name[:-1] + (f"{name[-1]}.{count}",)
+            else:
+                name = f"{name}.{count}"
+            count = counts[name]
+        ret.append(name)
+        counts[name] = count + 1
+    return ret
+
+
+class _HtmlTable(NamedTuple):
+    colnames: List[Union[str, Tuple[str, ...]]]
+    columns: List[List[str]]
+    n_skipped_rows: int
+    n_skipped_columns: int
+
+
+def _read_table(
+    table: lxml.html.HtmlElement, *, max_n_rows: int, max_n_columns: int
+) -> _HtmlTable:
+    """Read colnames and columns from a <table>.
+
+    This mimics `pandas.read_html()`, which we used before, so existing
+    workflows keep their column names:
+
+    * If there is one header row, its texts are column names. "" becomes
+      "Unnamed: {i}", and duplicates become "{name}.1", "{name}.2", ....
+    * If there are several, each column name is a tuple with one text per
+      (non-empty) header row. "" becomes "Unnamed: {i}_level_{level}".
+    * If there are none, column names are "".
+    * Short rows are padded with "".
+    * In a one-column table, blank rows are skipped.
+
+    Only the first `max_n_rows` body rows and `max_n_columns` columns are
+    read. The rest are counted, so the caller can warn about them.
+    """
+    header_rows, body_rows, n_columns, n_skipped_rows = _read_table_rows(
+        table, max_n_rows
+    )
+
+    for row in header_rows + body_rows:
+        row.extend([""] * (n_columns - len(row)))
+
+    if len(header_rows) > 1:
+        # Ignore all-empty header rows
+        header_rows = [row for row in header_rows if any(row)]
+
+    if len(header_rows) == 1:
+        colnames = _dedupe_names(
+            [name or f"Unnamed: {i}" for i, name in enumerate(header_rows[0])]
+        )
+    elif header_rows:
+        colnames = _dedupe_names(
+            [
+                tuple(
+                    row[i] or f"Unnamed: {i}_level_{level}"
+                    for level, row in enumerate(header_rows)
+                )
+                for i in range(n_columns)
+            ]
+        )
+    else:
+        colnames = [""] * n_columns
+
+    n_kept_columns = min(n_columns, max_n_columns)
+    return _HtmlTable(
+        colnames=colnames[:n_kept_columns],
+        columns=[[row[i] for row in body_rows] for i in range(n_kept_columns)],
+        n_skipped_rows=n_skipped_rows,
+        n_skipped_columns=n_columns - n_kept_columns,
+    )
+
+
 def render(
     arrow_table,
     params: Dict[str, Any],
@@ -182,7 +848,7 @@ def render(
     *,
     fetch_result: Optional[FetchResult],
     settings: Settings,
-    **kwargs
+    **kwargs,
 ) -> List[I18nMessage]:
     if fetch_result is None:
         return []
@@ -192,6 +858,9 @@ def render(
     if fetch_result.path.stat().st_size == 0:
         return errors  # interpreted as either empty result or error
 
+    # Lazy import: it pulls in pyarrow.parquet, which fetch_arrow() never needs
+    import cjwparquet
+
     if cjwparquet.file_has_parquet_magic_number(fetch_result.path):
         return _render_v0(
             fetch_result=fetch_result,
@@ -202,10 +871,6 @@ def render(
 
     # Okay, it's a v1 data file
 
-    # We delve into pd.read_html()'s innards, below. Part of that means some
-    # first-use initialization.
-    pd.io.html._importers()
-
     with httpfile.read(fetch_result.path) as http:
         if http.status_line != "200 OK":
             errors.append(
@@ -218,50 +883,18 @@ def render(
             return errors
 
         content_type = httpfile.extract_first_header(http.headers, "Content-Type")
-        if content_type:
-            try:
-                encoding = content_type.split("charset=")[1]
-            except IndexError:
-                encoding = None
-        else:
-            encoding = None
-
-        try:
-            tables = pd.io.html._parse(
-                # Positional arguments:
-                flavor="html5lib",  # force algorithm, for reproducibility
-                io=http.body_path.as_posix(),
-                encoding=encoding,
-                match=".+",
-                attrs=None,
-                displayed_only=False,  # avoid dud feature: it ignores CSS
-                # Required kwargs that pd.read_html() would set by default:
-                header=None,
-                skiprows=None,
-                # Now the reason we used pd.io.html._parse() instead of
-                # pd.read_html(): we get to pass whatever kwargs we want to
-                # TextParser.
-                #
-                # kwargs we get to add as a result of this hack:
-                na_filter=False,  # do not autoconvert
-                dtype=str,  # do not autoconvert
-            )
-        except ValueError:
-            # pandas.read_html() gives this unhelpful error message....
-            errors.append(
-                trans("html.noTables", "Did not find any <table> tags in this page")
-            )
-            return errors
-        except IndexError:
-            # pandas.read_html() gives this unhelpful error message....
-            # TODO reproduce this in our test suite
-            errors.append(
-                trans("html.noColumns", "Found a <table> tag with no columns")
-            )
-            return errors
-
-    if not len(tables):
-        # TODO reproduce this in our test suite
+        encoding = _find_charset(content_type or "")
+        if encoding is None:
+            # Like browsers, look for <meta charset> near the top of the page
+            with http.body_path.open("rb") as f:
+                encoding = _find_charset(f.read(1024).decode("latin1"))
+        if encoding is None:
+            encoding = "utf-8"  # by far the most common, in 2021
+
+        # lxml is a C parser, an order of magnitude faster than html5lib
+        tables = _find_tables(http.body_path, encoding)
+
+    if not tables:
         errors.append(
             trans("html.noTables", "Did not find any <table> tags in this page")
         )
@@ -277,15 +910,28 @@ def render(
         )
         return errors
 
-    table = tables[params["tablenum"] - 1]
+    html_table = _read_table(
+        tables[params["tablenum"] - 1],
+        # With first_row_is_header, the first body row holds column names
+        max_n_rows=settings.MAX_ROWS_PER_TABLE + int(params["first_row_is_header"]),
+        max_n_columns=settings.MAX_COLUMNS_PER_TABLE,
+    )
+    if not html_table.columns:
+        errors.append(trans("html.noColumns", "Found a <table> tag with no columns"))
+        return errors
 
     errors.extend(
-        _write_dataframe_as_arrow_table_and_handle_lots_of_edge_cases(
-            table=table,
+        _write_arrow_table_and_handle_lots_of_edge_cases(
+            table=pa.Table.from_arrays(
+                [pa.array(column, pa.utf8()) for column in html_table.columns],
+                names=[str(i) for i in range(len(html_table.columns))],
+            ),
             output_path=output_path,
-            colnames=_merge_colspan_headers(table.columns),
+            colnames=_merge_colspan_headers(html_table.colnames),
             first_row_is_header=params["first_row_is_header"],
             settings=settings,
+            n_skipped_rows=html_table.n_skipped_rows,
+            n_skipped_columns=html_table.n_skipped_columns,
         )
     )
 
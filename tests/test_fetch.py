@@ -1,3 +1,4 @@
+import asyncio
 import tempfile
 from pathlib import Path
 
@@ -5,6 +6,7 @@ from cjwmodule.http import httpfile
 from cjwmodule.testing.i18n import cjwmodule_i18n_message
 from pytest_httpx import HTTPXMock
 
+import scrapetable
 from scrapetable import FetchResult, fetch_arrow
 
 
@@ -24,6 +26,19 @@ def test_fetch_happy_path(httpx_mock: HTTPXMock):
             assert body_path.read_bytes() == body
 
 
+def test_fetch_reuses_event_loop(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="http://example.org", data=b"<table></table>")
+
+    with tempfile.NamedTemporaryFile() as tf:
+        path = Path(tf.name)
+        fetch_arrow(P(url="http://example.org"), {}, None, None, path)
+        loop = scrapetable._thread_local.loop
+        fetch_arrow(P(url="http://example.org"), {}, None, None, path)
+        assert scrapetable._thread_local.loop is loop
+        assert not loop.is_closed()
+        assert not asyncio.all_tasks(loop)
+
+
 def test_fetch_http_error(httpx_mock: HTTPXMock):
     # httpx_mock's default behavior is to raise `httpx.TimeoutException`.
     # ref: https://pypi.org/project/pytest-httpx/#raising-exceptions
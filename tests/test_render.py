@@ -1,10 +1,13 @@
 import contextlib
+import datetime
+import decimal
 import io
 import tempfile
 from pathlib import Path
 from typing import ContextManager, List, NamedTuple, Optional, Tuple
 
 import pyarrow as pa
+import pyarrow.parquet
 from cjwmodule.http import httpfile
 from cjwmodule.testing.i18n import cjwmodule_i18n_message, i18n_message
 
@@ -17,7 +20,6 @@ class DefaultSettings(NamedTuple):
     MAX_BYTES_PER_VALUE: int = 10000
     MAX_BYTES_TEXT_DATA: int = 100000
     MAX_BYTES_PER_COLUMN_NAME: int = 100
-    MAX_CSV_BYTES: int = 1000000
     MAX_DICTIONARY_PYLIST_N_BYTES: int = 1000
     MIN_DICTIONARY_COMPRESSION_RATIO_PYLIST_N_BYTES: float = 2.0
 
@@ -158,6 +160,94 @@ def test_render_legacy_v0_file_first_row_is_header():
         )
 
 
+def test_render_legacy_v0_file_timestamps_dates_and_bools():
+    with _temp_parquet_file(
+        pa.table(
+            {
+                "A": pa.array(
+                    [datetime.datetime(2021, 1, 2, 3, 4, 5, 123000), None],
+                    pa.timestamp("ns"),
+                ),
+                "B": pa.array(
+                    [datetime.datetime(2021, 1, 2), datetime.datetime(2021, 1, 3)],
+                    pa.timestamp("ns"),
+                ),
+                "C": pa.array([datetime.date(2021, 1, 2), None], pa.date32()),
+                "D": pa.array([True, None]),
+            }
+        )
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(first_row_is_header=False),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        # Same text DataFrame.to_csv() used to write
+        _assert_table_file(
+            render_path,
+            pa.table(
+                {
+                    "A": ["2021-01-02 03:04:05.123", ""],
+                    "B": ["2021-01-02", "2021-01-03"],
+                    "C": ["2021-01-02", ""],
+                    "D": ["True", ""],
+                }
+            ),
+        )
+
+
+def test_render_legacy_v0_file_timezones_and_uncastable_types():
+    with _temp_parquet_file(
+        pa.table(
+            {
+                "A": pa.array(
+                    [1609556645000000, 1609556645123000, None],
+                    pa.timestamp("us", "America/Toronto"),
+                ),
+                "B": pa.array(
+                    [datetime.time(3, 4, 5), datetime.time(1, 2, 3, 456000), None],
+                    pa.time64("us"),
+                ),
+                "C": pa.array(
+                    [decimal.Decimal("1.23"), decimal.Decimal("-4.50"), None],
+                    pa.decimal128(5, 2),
+                ),
+                "D": pa.array([[1, 2], [], None], pa.list_(pa.int64())),
+            }
+        )
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(first_row_is_header=False),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(
+            render_path,
+            pa.table(
+                {
+                    "A": [
+                        "2021-01-02 03:04:05+00:00",
+                        "2021-01-02 03:04:05.123000+00:00",
+                        "",
+                    ],
+                    "B": ["03:04:05", "01:02:03.456000", ""],
+                    "C": [1.23, -4.5, None],
+                    "D": ["[1, 2]", "[]", ""],
+                }
+            ),
+        )
+
+
 def test_render_v1():
     with tempfile.NamedTemporaryFile() as fetch_tf, tempfile.NamedTemporaryFile() as render_tf:
         fetch_path = Path(fetch_tf.name)
@@ -251,6 +341,216 @@ def test_render_v1_missing_content_type_and_charset():
         _assert_table_file(render_path, pa.table({"ééééé": ["a"]}))
 
 
+def test_render_v1_quoted_charset_with_more_params():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        """
+            <table>
+                <thead><tr><th>café</th></tr></thead>
+                <tbody><tr><td>a</td></tbody>
+            </table>
+        """.encode(
+            "windows-1252"
+        ),
+        headers=[("Content-Type", 'text/html; charset="windows-1252"; foo=bar')],
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file", tablenum=1, first_row_is_header=False),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"café": ["a"]}))
+
+
+def test_render_v1_meta_charset():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        """
+            <html><head><meta charset="windows-1252"></head><body><table>
+                <thead><tr><th>café</th></tr></thead>
+                <tbody><tr><td>a</td></tbody>
+            </table></body></html>
+        """.encode(
+            "windows-1252"
+        ),
+        headers=[("Content-Type", "text/html")],
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file", tablenum=1, first_row_is_header=False),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"café": ["a"]}))
+
+
+def test_render_v1_python_only_charset_name():
+    # libxml2 doesn't know "latin_1"; Python calls it that
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        """
+            <table>
+                <thead><tr><th>café</th></tr></thead>
+                <tbody><tr><td>a</td></tbody>
+            </table>
+        """.encode(
+            "latin-1"
+        ),
+        headers=[("Content-Type", "text/html; charset=latin_1")],
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file", tablenum=1, first_row_is_header=False),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"café": ["a"]}))
+
+
+def test_render_v1_deeply_nested_table():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        (
+            b"<div>" * 300
+            + b"<table><tr><th>A</th></tr><tr><td>a</td></tr></table>"
+            + b"</div>" * 300
+        ),
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"A": ["a"]}))
+
+
+def test_render_v1_huge_text_node():
+    # libxml2 stops parsing text nodes over 10MB, unless we ask it not to
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        (
+            b"<table><tr><th>A</th></tr><tr><td>"
+            + b"x" * (11 * 1024 * 1024)
+            + b"</td></tr><tr><td>y</td></tr></table>"
+        ),
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(MAX_BYTES_PER_VALUE=3),
+        )
+        assert result == [
+            i18n_message(
+                "warning.truncatedValues",
+                {"n_values": 1, "max_n_bytes": 3, "row_number": 1, "column_number": 1},
+            )
+        ]
+        _assert_table_file(render_path, pa.table({"A": ["xxx", "y"]}))
+
+
+def test_render_v1_tr_inside_form():
+    # lxml leaves the <form> between <table> and <tr>
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"<table><form><tr><th>A</th></tr><tr><td>a</td></tr></form></table>",
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"A": ["a"]}))
+
+
+def test_render_v1_td_without_tr():
+    # lxml leaves the <td>s as children of <table>; html5lib added a <tr>
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"<table><tr><th>A</th></tr><td>a</td><td>b</td></table>",
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"A": ["a"], "Unnamed: 1": ["b"]}))
+
+
+def test_render_v1_keep_blank_rows_in_wide_table():
+    # pandas pads blank rows to the table's width, and then keeps them
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <table>
+                <tr><th>A</th><th>B</th></tr>
+                <tr><td>1</td><td>2</td></tr>
+                <tr></tr>
+                <tr><td></td></tr>
+                <tr><td>3</td><td>4</td></tr>
+            </table>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(
+            render_path,
+            pa.table(
+                {
+                    "A": pa.array([1, None, None, 3], pa.int8()),
+                    "B": pa.array([2, None, None, 4], pa.int8()),
+                }
+            ),
+        )
+
+
 def test_render_v1_first_row_is_header():
     with _temp_httpfile(
         "http://example.org/file",
@@ -303,6 +603,83 @@ def test_render_v1_wrong_tablenum():
         _assert_table_file(render_path, None)
 
 
+def test_render_v1_tablenum_skips_tables_without_text():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <html><body>
+                <table><tr><th>A</th></tr><tr><td>a</td></tr></table>
+                <table></table>
+                <table><tr><th>B</th></tr><tr><td>b</td></tr></table>
+            </body></html>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file", tablenum=2, first_row_is_header=False),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"B": ["b"]}))
+
+
+def test_render_v1_tablenum_counts_tables_with_only_whitespace_text():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <html><body>
+                <table><tr><th>A</th></tr><tr><td>a</td></tr></table>
+                <table>
+                    <tr><td><img src="a.png"></td><td></td></tr>
+                </table>
+                <table><tr><th>B</th></tr><tr><td>b</td></tr></table>
+            </body></html>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file", tablenum=3, first_row_is_header=False),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"B": ["b"]}))
+
+
+def test_render_v1_tablenum_skips_tables_without_rows():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <html><body>
+                <table><caption>Nothing here</caption></table>
+                <table><tr><th>A</th></tr><tr><td>a</td></tr></table>
+                <table><tr><th>B</th></tr><tr><td>b</td></tr></table>
+            </body></html>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file", tablenum=2, first_row_is_header=False),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"B": ["b"]}))
+
+
 def test_render_v1_first_row_is_header_zero_rows():
     with _temp_httpfile(
         "http://example.org/file",
@@ -405,6 +782,25 @@ def test_render_v1_empty_tr():
         _assert_table_file(render_path, None)
 
 
+def test_render_v1_table_without_cells():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"<html><body><table><caption>Nothing here</caption></table></body></html>",
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == [i18n_message("html.noTables")]
+        _assert_table_file(render_path, None)
+
+
 def test_render_v1_merge_colspan_headers():
     with _temp_httpfile(
         "http://example.org/file",
@@ -433,6 +829,40 @@ def test_render_v1_merge_colspan_headers():
         )
 
 
+def test_render_v1_rowspan_and_duplicate_headers():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <table>
+                <tr><th>A</th><th>A</th></tr>
+                <tr><td rowspan="2">x</td><td>a</td></tr>
+                <tr><td>b</td></tr>
+            </table>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(),
+        )
+        assert result == []
+        _assert_table_file(
+            render_path,
+            pa.table(
+                {
+                    # Dictionary-encoded, because both values are the same
+                    "A": pa.array(["x", "x"]).dictionary_encode(),
+                    "A.1": ["a", "b"],
+                }
+            ),
+        )
+
+
 def test_render_v1_no_thead():
     with _temp_httpfile(
         "http://example.org/file",
@@ -497,3 +927,210 @@ def test_render_v1_icky_unnamed_columns_from_pandas():
             ),
         )
         assert result == []
+
+
+def test_render_v1_truncate_rows_and_columns():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <table>
+                <thead><tr><th>A</th><th>B</th></tr></thead>
+                <tbody>
+                    <tr><td>1</td><td>a</td></tr>
+                    <tr><td>2</td><td>b</td></tr>
+                    <tr><td>3</td><td>c</td></tr>
+                </tbody>
+            </table>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(MAX_ROWS_PER_TABLE=2, MAX_COLUMNS_PER_TABLE=1),
+        )
+        assert result == [
+            i18n_message(
+                "warning.skippedColumns", {"n_columns": 1, "max_n_columns": 1}
+            ),
+            i18n_message("warning.skippedRows", {"n_rows": 1, "max_n_rows": 2}),
+        ]
+        _assert_table_file(render_path, pa.table({"A": pa.array([1, 2], pa.int8())}))
+
+
+def test_render_v1_truncate_rows_ignores_blank_rows():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <table>
+                <tr><th>A</th></tr>
+                <tr><td>1</td></tr>
+                <tr><td> </td></tr>
+                <tr><td>2</td></tr>
+                <tr><td>3</td></tr>
+                <tr></tr>
+            </table>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(MAX_ROWS_PER_TABLE=2),
+        )
+        assert result == [
+            i18n_message("warning.skippedRows", {"n_rows": 1, "max_n_rows": 2}),
+        ]
+        _assert_table_file(render_path, pa.table({"A": pa.array([1, 2], pa.int8())}))
+
+
+def test_render_v1_truncate_rows_ignores_trailing_blank_rows():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <table>
+                <tr><th>A</th></tr>
+                <tr><td>1</td></tr>
+                <tr><td>2</td></tr>
+                <tr><td> </td></tr>
+                <tr><td></td></tr>
+            </table>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(MAX_ROWS_PER_TABLE=2),
+        )
+        assert result == []
+        _assert_table_file(render_path, pa.table({"A": pa.array([1, 2], pa.int8())}))
+
+
+def test_render_v1_truncate_rows_counts_rowspan_rows():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <table>
+                <tr><th>A</th><th>B</th></tr>
+                <tr><td>1</td><td rowspan="10">x</td></tr>
+            </table>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(MAX_ROWS_PER_TABLE=2),
+        )
+        assert result == [
+            i18n_message("warning.skippedRows", {"n_rows": 8, "max_n_rows": 2}),
+        ]
+        _assert_table_file(
+            render_path,
+            # Like pandas, rowspan cells shift left into short rows
+            pa.table({"A": ["1", "x"], "B": ["x", ""]}),
+        )
+
+
+def test_render_v1_truncate_rows_first_row_is_header():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <table>
+                <tr><td>A</td></tr>
+                <tr><td>1</td></tr>
+                <tr><td>2</td></tr>
+                <tr><td>3</td></tr>
+            </table>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file", first_row_is_header=True),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(MAX_ROWS_PER_TABLE=2),
+        )
+        assert result == [
+            i18n_message("warning.skippedRows", {"n_rows": 1, "max_n_rows": 2}),
+        ]
+        _assert_table_file(render_path, pa.table({"A": pa.array([1, 2], pa.int8())}))
+
+
+def test_render_v1_truncate_values():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        "<table><tr><th>A</th></tr><tr><td>a</td></tr><tr><td>éé</td></tr></table>".encode(
+            "utf-8"
+        ),
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(MAX_BYTES_PER_VALUE=3),
+        )
+        assert result == [
+            i18n_message(
+                "warning.truncatedValues",
+                {"n_values": 1, "max_n_bytes": 3, "row_number": 2, "column_number": 1},
+            ),
+        ]
+        # Never split a UTF-8 character in half
+        _assert_table_file(render_path, pa.table({"A": ["a", "é"]}))
+
+
+def test_render_v1_truncate_text_data():
+    with _temp_httpfile(
+        "http://example.org/file",
+        "200 OK",
+        b"""
+            <table>
+                <thead><tr><th>A</th><th>B</th></tr></thead>
+                <tbody>
+                    <tr><td>aa</td><td>bb</td></tr>
+                    <tr><td>cc</td><td>dd</td></tr>
+                    <tr><td>ee</td><td>ff</td></tr>
+                </tbody>
+            </table>
+        """,
+    ) as fetch_path, tempfile.NamedTemporaryFile() as render_tf:
+        render_path = Path(render_tf.name)
+        fetch_result = FetchResult(fetch_path, [])
+        result = render(
+            pa.table({}),
+            P(url="http://example.org/file"),
+            render_path,
+            fetch_result=fetch_result,
+            settings=DefaultSettings(MAX_BYTES_TEXT_DATA=9),
+        )
+        assert result == [
+            i18n_message("warning.tooMuchText", {"n_rows": 1, "max_n_bytes": 9})
+        ]
+        _assert_table_file(
+            render_path, pa.table({"A": ["aa", "cc"], "B": ["bb", "dd"]})
+        )